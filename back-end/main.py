@@ -1,4 +1,5 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import polars as pl
@@ -6,11 +7,30 @@ import dotenv
 from datetime import datetime
 from database import get_db
 from model import Dataset, Crime
+from sampling import (
+    add_sample_weights,
+    count_variance,
+    estimate_counts,
+    estimate_row_count,
+    get_strata,
+    Z_95,
+)
+from storage import (
+    ARCHIVE_AFTER_DAYS,
+    archive_cold_datasets,
+    build_rollups,
+    ensure_hot,
+    get_archive_store,
+    insert_rollups,
+    read_rollup,
+    touch_dataset,
+)
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from supabase import create_client, Client
 from io import BytesIO
+import math
 import time
 from pydantic import BaseModel
 
@@ -19,6 +39,9 @@ dotenv.load_dotenv()
 # Initialize Supabase client
 supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
 
+# Object storage for datasets archived out of the crime table
+archive_store = get_archive_store(supabase)
+
 app = FastAPI()
 
 # Configure CORS
@@ -61,12 +84,71 @@ class AnomalyDetectionResponse(BaseModel):
     total_analyzed: int
     analysis_time_seconds: float
     anomaly_count: int
+    approximate: bool = False
 
 
 class ChartDataResponse(BaseModel):
     labels: List[str]
     values: List[int]
     total: int
+    # Set for estimates from the sample, margins are 95% confidence half-widths
+    approximate: bool = False
+    margins: Optional[List[int]] = None
+    total_margin: Optional[int] = None
+
+
+def load_dataset(dataset_id: str, db: Session) -> Dataset:
+    # Look up a dataset and mark it as recently accessed
+    dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    touch_dataset(db, dataset)
+    return dataset
+
+
+def count_crimes(
+    db: Session, dataset: Dataset, approximate: bool = False
+) -> Tuple[int, bool]:
+    # Number of crimes in a dataset and whether it was estimated from the sample
+    if dataset.row_count is not None:
+        return dataset.row_count, False
+
+    if approximate:
+        estimate = estimate_row_count(db, str(dataset.id))
+        if estimate is not None:
+            return estimate, True
+
+    # Older datasets have no stored count, so save it for next time
+    crime_count = db.query(Crime).filter(Crime.dataset == dataset.id).count()
+    dataset.row_count = crime_count
+    db.commit()
+    return crime_count, False
+
+
+def approximate_chart_response(estimate, format_label=str) -> ChartDataResponse:
+    # Build a chart response from the output of estimate_counts
+    counts, total, total_margin = estimate
+    return ChartDataResponse(
+        labels=[format_label(label) for label, _, _ in counts],
+        values=[round(value) for _, value, _ in counts],
+        total=round(total),
+        approximate=True,
+        margins=[math.ceil(margin) for _, _, margin in counts],
+        total_margin=math.ceil(total_margin),
+    )
+
+
+def format_hour(hour):
+    # Format hours as "12 AM", "1 AM", etc.
+    if hour == 0:
+        return "12 AM"
+    elif hour < 12:
+        return f"{hour} AM"
+    elif hour == 12:
+        return "12 PM"
+    else:
+        return f"{hour - 12} PM"
 
 
 @app.post("/upload-dataset")
@@ -227,12 +309,17 @@ async def process(file: UploadFile, db: Session):
             ]
         )
 
+        # Mark a stratified sample per area for approximate queries
+        db_ready_df = add_sample_weights(db_ready_df)
+
         # Convert to records for database insertion
         records = db_ready_df.to_dicts()
 
         # Bulk insert using SQLAlchemy Core
         print("\nPerforming bulk insertion...")
         db.execute(Crime.__table__.insert(), records)
+        dataset.row_count = len(records)
+        insert_rollups(db, dataset.id, build_rollups([db_ready_df]))
         db.commit()
 
         total_time = time.time() - start_time
@@ -252,26 +339,80 @@ async def process(file: UploadFile, db: Session):
 
 
 @app.post("/datasets/{dataset_id}/detect-anomalies")
-async def detect_anomalies(dataset_id: str, db: Session = Depends(get_db)):
+async def detect_anomalies(
+    dataset_id: str, approximate: bool = False, db: Session = Depends(get_db)
+):
     start_time = time.time()
+    dataset = load_dataset(dataset_id, db)
 
     try:
-        # Step 1: Calculate area-wide statistics
-        query = text("""
-            WITH location_counts AS (
-                -- Count crimes per location within each area
+        # Approximate mode scales up location counts from the stratified sample
+        strata = get_strata(db, dataset_id) if approximate else {}
+        approximate = bool(strata)
+        if approximate:
+            count_sql = "SUM(sample_weight)"
+            sample_filter = "AND sample_weight IS NOT NULL"
+            # Locations without sampled crimes are missing from location_counts,
+            # so average over the real number of locations stored at ingest and
+            # count the missing ones as zero in the standard deviation. A squared
+            # estimate overshoots the squared count by its sampling variance on
+            # average (see count_variance), so that variance is subtracted.
+            metrics_sql = """
+            strata AS (
                 SELECT 
                     area_name,
-                    location,
-                    lat,
-                    lon,
-                    COUNT(*) as crime_count
-                FROM crime 
+                    COUNT(*)::float as sample_size,
+                    SUM(sample_weight) as stratum_size
+                FROM crime
                 WHERE dataset = :dataset_id
-                    AND lat IS NOT NULL 
-                    AND lon IS NOT NULL
-                GROUP BY area_name, location, lat, lon
+                    AND sample_weight IS NOT NULL
+                GROUP BY area_name
+            ),
+            location_variances AS (
+                SELECT 
+                    lc.area_name,
+                    lc.crime_count,
+                    CASE WHEN s.stratum_size <= 1 THEN 0 ELSE
+                        s.stratum_size * s.stratum_size
+                        * (lc.sampled_count / s.sample_size)
+                        * (1 - lc.sampled_count / s.sample_size)
+                        / s.sample_size
+                        * GREATEST(s.stratum_size - s.sample_size, 0)
+                        / (s.stratum_size - 1)
+                    END as variance
+                FROM location_counts lc
+                JOIN strata s ON s.area_name = lc.area_name
+            ),
+            location_totals AS (
+                SELECT 
+                    lv.area_name,
+                    GREATEST(COUNT(*), COALESCE(MAX(r.crime_count), 0))::float
+                        as total_locations,
+                    SUM(lv.crime_count) as sum_crimes,
+                    SUM(lv.crime_count * lv.crime_count - lv.variance) as sum_squares
+                FROM location_variances lv
+                LEFT JOIN dataset_rollup r ON r.dataset = :dataset_id
+                    AND r.dimension = 'locations'
+                    AND r.label = lv.area_name
+                GROUP BY lv.area_name
             ),
+            area_metrics AS (
+                -- Calculate statistics per area
+                SELECT 
+                    area_name,
+                    sum_crimes / total_locations as avg_crimes,
+                    SQRT(GREATEST(
+                        (sum_squares - sum_crimes * sum_crimes / total_locations)
+                            / NULLIF(total_locations - 1, 0),
+                        0
+                    )) as stddev_crimes,
+                    total_locations
+                FROM location_totals
+            )"""
+        else:
+            count_sql = "COUNT(*)"
+            sample_filter = ""
+            metrics_sql = """
             area_metrics AS (
                 -- Calculate statistics per area
                 SELECT 
@@ -281,7 +422,27 @@ async def detect_anomalies(dataset_id: str, db: Session = Depends(get_db)):
                     COUNT(*) as total_locations
                 FROM location_counts
                 GROUP BY area_name
-            )
+            )"""
+            await run_in_threadpool(ensure_hot, db, dataset, archive_store)
+
+        # Step 1: Calculate area-wide statistics
+        query = text(f"""
+            WITH location_counts AS (
+                -- Count crimes per location within each area
+                SELECT 
+                    area_name,
+                    location,
+                    lat,
+                    lon,
+                    {count_sql} as crime_count,
+                    COUNT(*) as sampled_count
+                FROM crime 
+                WHERE dataset = :dataset_id
+                    AND lat IS NOT NULL 
+                    AND lon IS NOT NULL
+                    {sample_filter}
+                GROUP BY area_name, location, lat, lon
+            ),{metrics_sql}
             -- Identify anomalous locations (more than 2 standard deviations from mean)
             SELECT 
                 lc.area_name,
@@ -289,6 +450,7 @@ async def detect_anomalies(dataset_id: str, db: Session = Depends(get_db)):
                 lc.lat,
                 lc.lon,
                 lc.crime_count,
+                lc.sampled_count,
                 am.avg_crimes,
                 am.stddev_crimes,
                 (lc.crime_count - am.avg_crimes) / NULLIF(am.stddev_crimes, 0) as z_score
@@ -304,20 +466,19 @@ async def detect_anomalies(dataset_id: str, db: Session = Depends(get_db)):
 
         # Step 2: For each anomalous location, get the most recent crimes
         anomalies = []
-        total_analyzed = db.query(Crime).filter(Crime.dataset == dataset_id).count()
+        total_analyzed, _ = count_crimes(db, dataset, approximate)
 
         print("Analyzing areas")
         for stat in area_stats:
             # Get a representative crime from this location
-            crime = (
-                db.query(Crime)
-                .filter(
-                    Crime.dataset == dataset_id,
-                    Crime.location == stat.location,
-                    Crime.area_name == stat.area_name,
-                )
-                .first()
+            query = db.query(Crime).filter(
+                Crime.dataset == dataset_id,
+                Crime.location == stat.location,
+                Crime.area_name == stat.area_name,
             )
+            if approximate:
+                query = query.filter(Crime.sample_weight.isnot(None))
+            crime = query.first()
 
             if crime:
                 z_score = stat.z_score
@@ -327,13 +488,24 @@ async def detect_anomalies(dataset_id: str, db: Session = Depends(get_db)):
 
                 # Generate a detailed description of why this is anomalous
                 avg_crimes = round(stat.avg_crimes, 1)
-                actual_crimes = stat.crime_count
+                actual_crimes = round(stat.crime_count)
                 times_higher = round(actual_crimes / avg_crimes, 1)
 
-                description = (
-                    f"This location has {actual_crimes} reported crimes, which is {times_higher}x higher "
-                    f"than the average of {avg_crimes} crimes per location in {stat.area_name}. "
-                )
+                if approximate:
+                    sample_size, stratum_size = strata[stat.area_name]
+                    margin = Z_95 * math.sqrt(
+                        count_variance(stat.sampled_count, sample_size, stratum_size)
+                    )
+                    description = (
+                        f"This location has an estimated {actual_crimes} (±{math.ceil(margin)}) reported crimes, "
+                        f"which is {times_higher}x higher than the estimated average of {avg_crimes} crimes "
+                        f"per location in {stat.area_name}. "
+                    )
+                else:
+                    description = (
+                        f"This location has {actual_crimes} reported crimes, which is {times_higher}x higher "
+                        f"than the average of {avg_crimes} crimes per location in {stat.area_name}. "
+                    )
 
                 anomalies.append(
                     AnomalyRecord(
@@ -357,6 +529,7 @@ async def detect_anomalies(dataset_id: str, db: Session = Depends(get_db)):
             total_analyzed=total_analyzed,
             analysis_time_seconds=analysis_time,
             anomaly_count=len(anomalies),
+            approximate=approximate,
         )
 
     except Exception as e:
@@ -367,14 +540,14 @@ async def detect_anomalies(dataset_id: str, db: Session = Depends(get_db)):
 
 
 @app.get("/datasets/{dataset_id}")
-async def get_dataset(dataset_id: str, db: Session = Depends(get_db)):
-    try:
-        dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
-        if not dataset:
-            raise HTTPException(status_code=404, detail="Dataset not found")
+async def get_dataset(
+    dataset_id: str, approximate: bool = False, db: Session = Depends(get_db)
+):
+    dataset = load_dataset(dataset_id, db)
 
+    try:
         # Get basic stats about the dataset
-        crime_count = db.query(Crime).filter(Crime.dataset == dataset.id).count()
+        crime_count, estimated = count_crimes(db, dataset, approximate)
 
         return {
             "dataset": {
@@ -383,6 +556,8 @@ async def get_dataset(dataset_id: str, db: Session = Depends(get_db)):
                 "createdAt": dataset.created_at.isoformat(),
                 "rowCount": crime_count,
                 "columnCount": 30,  # Hardcoded for now since we know our schema
+                "rowCountApproximate": estimated,
+                "archived": dataset.archived_at is not None,
             }
         }
     except Exception as e:
@@ -400,7 +575,11 @@ async def get_crimes(
     end_date: str = "2024-12-31",
     db: Session = Depends(get_db),
 ):
+    dataset = load_dataset(dataset_id, db)
+
     try:
+        await run_in_threadpool(ensure_hot, db, dataset, archive_store)
+
         # Calculate offset
         offset = (page - 1) * page_size
 
@@ -466,9 +645,29 @@ async def get_crimes_by_area(
     dataset_id: str,
     start_date: str = "2024-01-01",
     end_date: str = "2024-12-31",
+    approximate: bool = False,
     db: Session = Depends(get_db),
 ):
+    dataset = load_dataset(dataset_id, db)
+
     try:
+        rollup = read_rollup(db, dataset, "area", start_date, end_date)
+        if rollup is not None:
+            return ChartDataResponse(
+                labels=[label for label, _ in rollup],
+                values=[count for _, count in rollup],
+                total=sum(count for _, count in rollup),
+            )
+
+        if approximate:
+            estimate = estimate_counts(
+                db, dataset_id, "area_name", start_date, end_date
+            )
+            if estimate is not None:
+                return approximate_chart_response(estimate)
+
+        await run_in_threadpool(ensure_hot, db, dataset, archive_store)
+
         query = text("""
             SELECT 
                 area_name,
@@ -511,9 +710,34 @@ async def get_crimes_by_type(
     start_date: str = "2024-01-01",
     end_date: str = "2024-12-31",
     limit: int = 10,
+    approximate: bool = False,
     db: Session = Depends(get_db),
 ):
+    dataset = load_dataset(dataset_id, db)
+
     try:
+        rollup = read_rollup(db, dataset, "type", start_date, end_date)
+        if rollup is not None:
+            rollup = rollup[:limit]
+            return ChartDataResponse(
+                labels=[label for label, _ in rollup],
+                values=[count for _, count in rollup],
+                total=sum(count for _, count in rollup),
+            )
+
+        if approximate:
+            estimate = estimate_counts(
+                db, dataset_id, "crime_code_desc", start_date, end_date
+            )
+            if estimate is not None:
+                # Like the exact query, the total only covers the top types
+                counts = estimate[0][:limit]
+                total = sum(value for _, value, _ in counts)
+                total_margin = math.sqrt(sum(margin**2 for _, _, margin in counts))
+                return approximate_chart_response((counts, total, total_margin))
+
+        await run_in_threadpool(ensure_hot, db, dataset, archive_store)
+
         query = text("""
             SELECT 
                 crime_code_desc,
@@ -557,9 +781,39 @@ async def get_crimes_by_time(
     dataset_id: str,
     start_date: str = "2024-01-01",
     end_date: str = "2024-12-31",
+    approximate: bool = False,
     db: Session = Depends(get_db),
 ):
+    dataset = load_dataset(dataset_id, db)
+
     try:
+        rollup = read_rollup(db, dataset, "hour", start_date, end_date)
+        if rollup is not None:
+            rollup = sorted(rollup, key=lambda row: int(row[0]))
+            return ChartDataResponse(
+                labels=[format_hour(int(label)) for label, _ in rollup],
+                values=[count for _, count in rollup],
+                total=sum(count for _, count in rollup),
+            )
+
+        if approximate:
+            estimate = estimate_counts(
+                db,
+                dataset_id,
+                "EXTRACT(HOUR FROM date_time_occ)",
+                start_date,
+                end_date,
+            )
+            if estimate is not None:
+                counts, total, total_margin = estimate
+                counts = sorted(counts, key=lambda row: int(row[0]))
+                return approximate_chart_response(
+                    (counts, total, total_margin),
+                    lambda hour: format_hour(int(hour)),
+                )
+
+        await run_in_threadpool(ensure_hot, db, dataset, archive_store)
+
         query = text("""
             SELECT 
                 EXTRACT(HOUR FROM date_time_occ) as hour,
@@ -583,17 +837,6 @@ async def get_crimes_by_time(
 
         total = sum(row.crime_count for row in results)
 
-        # Format hours as "12 AM", "1 AM", etc.
-        def format_hour(hour):
-            if hour == 0:
-                return "12 AM"
-            elif hour < 12:
-                return f"{hour} AM"
-            elif hour == 12:
-                return "12 PM"
-            else:
-                return f"{hour - 12} PM"
-
         return ChartDataResponse(
             labels=[format_hour(int(row.hour)) for row in results],
             values=[row.crime_count for row in results],
@@ -605,3 +848,23 @@ async def get_crimes_by_time(
         raise HTTPException(
             status_code=500, detail=f"Failed to get crime time count: {str(e)}"
         )
+
+
+@app.post("/maintenance/archive-cold-datasets")
+def archive_cold(
+    days: int = Query(ARCHIVE_AFTER_DAYS, ge=1), db: Session = Depends(get_db)
+):
+    # Move datasets that haven't been accessed for `days` days to object storage.
+    # A plain def runs in the threadpool so archiving doesn't block the event loop
+    try:
+        archived = archive_cold_datasets(db, archive_store, days)
+        return {
+            "success": True,
+            "archivedDatasetIds": [str(dataset_id) for dataset_id in archived],
+            "message": f"Archived {len(archived)} dataset(s)",
+        }
+    except Exception as e:
+        print(f"Error archiving datasets: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to archive datasets: {str(e)}"
+        )
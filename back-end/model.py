@@ -17,6 +17,21 @@ class Dataset(Base):
     id = Column(BigInteger, primary_key=True)
     created_at = Column(TIMESTAMP(timezone=True))
     file_path = Column(Text)
+    row_count = Column(BigInteger)
+    first_occ = Column(TIMESTAMP(timezone=False))
+    last_occ = Column(TIMESTAMP(timezone=False))
+    last_accessed_at = Column(TIMESTAMP(timezone=True))
+    archived_at = Column(TIMESTAMP(timezone=True))
+    archive_path = Column(Text)
+
+
+class DatasetRollup(Base):
+    __tablename__ = "dataset_rollup"
+    id = Column(BigInteger, primary_key=True)
+    dataset = Column(BigInteger, ForeignKey("dataset.id"))
+    dimension = Column(Text)  # "area", "type", "hour" or "locations"
+    label = Column(Text)
+    crime_count = Column(BigInteger)
 
 
 class Crime(Base):
@@ -52,3 +67,4 @@ class Crime(Base):
     cross_street = Column(Text)
     lat = Column(Float)
     lon = Column(Float)
+    sample_weight = Column(Float)  # Set only for crimes in the stratified sample
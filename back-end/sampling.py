@@ -0,0 +1,151 @@
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import polars as pl
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Number of crimes kept per area in the stratified sample built at ingest
+SAMPLE_SIZE_PER_AREA = int(os.getenv("SAMPLE_SIZE_PER_AREA", "2000"))
+
+# z value for the 95% confidence intervals returned with estimates
+Z_95 = 1.96
+
+
+def add_sample_weights(
+    df: pl.DataFrame, per_area: int = SAMPLE_SIZE_PER_AREA
+) -> pl.DataFrame:
+    """Pick a uniform random sample of up to `per_area` crimes from each area
+    and store its inverse inclusion probability in `sample_weight`. Crimes
+    outside the sample get a null weight."""
+    position = pl.int_range(pl.len()).shuffle().over("area_name")
+    stratum_size = pl.len().over("area_name")
+    sample_size = pl.min_horizontal(stratum_size, pl.lit(per_area))
+
+    return df.with_columns(
+        pl.when(position < per_area)
+        .then(stratum_size / sample_size)
+        .otherwise(None)
+        .cast(pl.Float64)
+        .alias("sample_weight")
+    )
+
+
+def count_variance(hits: float, sample_size: int, stratum_size: float) -> float:
+    # Variance of N * p for a sample drawn without replacement from one stratum
+    if sample_size == 0 or stratum_size <= 1:
+        return 0.0
+
+    p = hits / sample_size
+    fpc = max(stratum_size - sample_size, 0) / (stratum_size - 1)
+    return stratum_size**2 * p * (1 - p) / sample_size * fpc
+
+
+def get_strata(db: Session, dataset_id: str) -> Dict[str, Tuple[int, float]]:
+    # Sample size and population size of each area in a dataset's sample
+    query = text("""
+        SELECT
+            area_name,
+            COUNT(*) as sample_size,
+            SUM(sample_weight) as stratum_size
+        FROM crime
+        WHERE dataset = :dataset_id
+            AND sample_weight IS NOT NULL
+        GROUP BY area_name
+    """)
+    results = db.execute(query, {"dataset_id": dataset_id}).fetchall()
+    return {row.area_name: (row.sample_size, row.stratum_size) for row in results}
+
+
+def estimate_row_count(db: Session, dataset_id: str) -> Optional[int]:
+    # The sample weights of each area add up to the number of crimes in it
+    strata = get_strata(db, dataset_id)
+    if not strata:
+        return None
+    return round(sum(stratum_size for _, stratum_size in strata.values()))
+
+
+def estimate_counts(
+    db: Session,
+    dataset_id: str,
+    label_sql: str,
+    start_date: str,
+    end_date: str,
+) -> Optional[Tuple[List[Tuple[str, float, float]], float, float]]:
+    """Estimate crime counts per label within a date range from the dataset's
+    stratified sample. See combine_estimates for the result, or None if the
+    dataset has no sample."""
+    query = text(f"""
+        SELECT
+            area_name,
+            {label_sql} as label,
+            COUNT(*) as sampled,
+            SUM(sample_weight) as weight,
+            COUNT(*) FILTER (
+                WHERE date_time_occ >= :start_date
+                    AND date_time_occ <= :end_date
+            ) as hits
+        FROM crime
+        WHERE dataset = :dataset_id
+            AND sample_weight IS NOT NULL
+        GROUP BY area_name, {label_sql}
+    """)
+    results = db.execute(
+        query,
+        {
+            "dataset_id": dataset_id,
+            "start_date": start_date,
+            "end_date": end_date + " 23:59:59",
+        },
+    ).fetchall()
+    if not results:
+        return None
+    return combine_estimates(results)
+
+
+def combine_estimates(
+    rows: Iterable[Tuple[str, Optional[str], int, float, int]],
+) -> Tuple[List[Tuple[str, float, float]], float, float]:
+    """Scale sampled counts up to estimates for the whole dataset.
+
+    Each row is (area_name, label, sampled, weight, hits): the number of
+    sampled crimes of an area with that label, the sum of their weights and
+    how many of them fall in the date range. Returns a list of
+    (label, estimate, margin) ordered by estimate, plus the estimated total and
+    its margin, where margins are 95% confidence interval half-widths.
+    """
+    rows = list(rows)
+
+    # Each area is a stratum, so sum up its sample and population sizes
+    strata: Dict[str, List[float]] = {}
+    for area_name, _, sampled, weight, hits in rows:
+        stratum = strata.setdefault(area_name, [0, 0.0, 0])
+        stratum[0] += sampled
+        stratum[1] += weight
+        stratum[2] += hits
+
+    # Estimates and variances add up across independent strata
+    estimates: Dict[str, List[float]] = {}
+    for area_name, label, _, _, hits in rows:
+        if label is None or hits == 0:
+            continue
+        sample_size, stratum_size, _ = strata[area_name]
+        estimate = estimates.setdefault(label, [0.0, 0.0])
+        estimate[0] += stratum_size * hits / sample_size
+        estimate[1] += count_variance(hits, sample_size, stratum_size)
+
+    total = sum(size * hits / sampled for sampled, size, hits in strata.values())
+    total_variance = sum(
+        count_variance(hits, sampled, size) for sampled, size, hits in strata.values()
+    )
+
+    counts = sorted(
+        (
+            (label, estimate, Z_95 * math.sqrt(variance))
+            for label, (estimate, variance) in estimates.items()
+        ),
+        key=lambda row: row[1],
+        reverse=True,
+    )
+    return counts, total, Z_95 * math.sqrt(total_variance)
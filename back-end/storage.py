@@ -0,0 +1,462 @@
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import polars as pl
+import pyarrow.parquet as pq
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Date,
+    Float,
+    TIMESTAMP,
+    Time,
+    func,
+    select,
+)
+from sqlalchemy.orm import Session
+
+from model import Crime, Dataset, DatasetRollup
+
+# Datasets that haven't been touched for this many days get archived
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+
+# Only write last_accessed_at once per interval so reads don't turn into writes
+TOUCH_INTERVAL = timedelta(hours=1)
+
+# Crimes are streamed to and from the archive in batches of this many rows
+ARCHIVE_BATCH_SIZE = 50_000
+
+
+def polars_dtype(column) -> pl.DataType:
+    # Map a crime table column to the Polars type it's archived as
+    if isinstance(column.type, BigInteger):
+        return pl.Int64
+    if isinstance(column.type, Float):
+        return pl.Float64
+    if isinstance(column.type, Boolean):
+        return pl.Boolean
+    if isinstance(column.type, TIMESTAMP):
+        return pl.Datetime("us", "UTC" if column.type.timezone else None)
+    if isinstance(column.type, Date):
+        return pl.Date
+    if isinstance(column.type, Time):
+        return pl.Time
+    return pl.Utf8
+
+
+# A fixed schema keeps batches consistent even when a column is all null
+CRIME_SCHEMA = {column.name: polars_dtype(column) for column in Crime.__table__.columns}
+ARCHIVE_SCHEMA = pl.DataFrame(schema=CRIME_SCHEMA).to_arrow().schema
+
+
+class ArchiveSummary(NamedTuple):
+    row_count: int
+    first_occ: Optional[datetime]
+    last_occ: Optional[datetime]
+    rollups: List[Tuple[str, str, int]]
+
+
+class ArchiveStore(ABC):
+    """Object storage holding archived datasets as compressed Parquet files.
+    Archives are moved through local files so they never sit in memory."""
+
+    @abstractmethod
+    def upload(self, key: str, path: Path) -> None: ...
+
+    @abstractmethod
+    def download(self, key: str, path: Path) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+
+class LocalArchiveStore(ArchiveStore):
+    """Stores archives on the local filesystem, useful for development."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def upload(self, key: str, path: Path) -> None:
+        target = self.root / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, target)
+
+    def download(self, key: str, path: Path) -> None:
+        shutil.copyfile(self.root / key, path)
+
+    def delete(self, key: str) -> None:
+        (self.root / key).unlink(missing_ok=True)
+
+
+class S3ArchiveStore(ArchiveStore):
+    """Stores archives in S3 or any S3-compatible service (MinIO, LocalStack)."""
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError(
+                "ARCHIVE_BACKEND=s3 requires boto3. Install it with `uv add boto3`."
+            )
+
+        self.bucket = bucket
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def upload(self, key: str, path: Path) -> None:
+        self.client.upload_file(str(path), self.bucket, key)
+
+    def download(self, key: str, path: Path) -> None:
+        self.client.download_file(self.bucket, key, str(path))
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+class SupabaseArchiveStore(ArchiveStore):
+    """Stores archives in a Supabase Storage bucket."""
+
+    def __init__(self, client, bucket: str):
+        self.bucket = client.storage.from_(bucket)
+
+    def upload(self, key: str, path: Path) -> None:
+        self.bucket.upload(
+            path=key,
+            file=str(path),
+            file_options={
+                "content-type": "application/vnd.apache.parquet",
+                "upsert": "true",
+            },
+        )
+
+    def download(self, key: str, path: Path) -> None:
+        # The Supabase client only returns downloads as bytes
+        Path(path).write_bytes(self.bucket.download(key))
+
+    def delete(self, key: str) -> None:
+        self.bucket.remove([key])
+
+
+def get_archive_store(supabase_client=None) -> ArchiveStore:
+    # Pick the storage backend from the environment, defaulting to local disk
+    backend = os.getenv("ARCHIVE_BACKEND", "local")
+    bucket = os.getenv("ARCHIVE_BUCKET", "dataset-archive")
+
+    if backend == "local":
+        return LocalArchiveStore(os.getenv("ARCHIVE_LOCAL_DIR", "archive"))
+    if backend == "s3":
+        return S3ArchiveStore(bucket, os.getenv("ARCHIVE_S3_ENDPOINT_URL"))
+    if backend == "supabase":
+        if supabase_client is None:
+            raise ValueError("ARCHIVE_BACKEND=supabase requires a Supabase client")
+        return SupabaseArchiveStore(supabase_client, bucket)
+
+    raise ValueError(
+        f"Unknown ARCHIVE_BACKEND '{backend}'. Use 'local', 's3' or 'supabase'."
+    )
+
+
+def touch_dataset(db: Session, dataset: Dataset) -> None:
+    # Record that the dataset is in use so it isn't considered cold
+    now = datetime.now(timezone.utc)
+    if dataset.last_accessed_at and now - dataset.last_accessed_at < TOUCH_INTERVAL:
+        return
+
+    dataset.last_accessed_at = now
+    db.commit()
+
+
+def build_rollups(batches: Iterable[pl.DataFrame]) -> List[Tuple[str, str, int]]:
+    # Pre-aggregate the counts the chart endpoints need over the whole dataset,
+    # one batch of crimes at a time
+    labels = {
+        "area": pl.col("area_name"),
+        "type": pl.col("crime_code_desc"),
+        "hour": pl.col("date_time_occ").dt.hour().cast(pl.Utf8),
+    }
+    grouped: Dict[str, pl.DataFrame] = {}
+    locations = None
+
+    for df in batches:
+        if df.height == 0:
+            continue
+
+        # Distinct locations per area, which approximate anomaly detection
+        # needs because the sample misses locations with few crimes
+        batch_locations = (
+            df.filter(pl.col("lat").is_not_null() & pl.col("lon").is_not_null())
+            .select(["area_name", "location", "lat", "lon"])
+            .unique()
+        )
+        if locations is not None:
+            batch_locations = pl.concat([locations, batch_locations]).unique()
+        locations = batch_locations
+
+        df = df.filter(pl.col("date_time_occ").is_not_null())
+        for dimension, label in labels.items():
+            counts = (
+                df.group_by(label.alias("label"))
+                .len()
+                .with_columns(pl.col("len").cast(pl.Int64))
+            )
+            if dimension in grouped:
+                counts = (
+                    pl.concat([grouped[dimension], counts])
+                    .group_by("label")
+                    .agg(pl.col("len").sum())
+                )
+            grouped[dimension] = counts
+
+    if locations is not None:
+        grouped["locations"] = locations.group_by(
+            pl.col("area_name").alias("label")
+        ).len()
+
+    rollups = []
+    for dimension, counts in grouped.items():
+        for row in counts.drop_nulls("label").iter_rows(named=True):
+            rollups.append((dimension, row["label"], row["len"]))
+    return rollups
+
+
+def insert_rollups(
+    db: Session, dataset_id: int, rollups: List[Tuple[str, str, int]]
+) -> None:
+    # Replace the stored rollups of a dataset
+    db.query(DatasetRollup).filter(DatasetRollup.dataset == dataset_id).delete()
+    if rollups:
+        db.execute(
+            DatasetRollup.__table__.insert(),
+            [
+                {
+                    "dataset": dataset_id,
+                    "dimension": dimension,
+                    "label": label,
+                    "crime_count": count,
+                }
+                for dimension, label, count in rollups
+            ],
+        )
+
+
+def read_rollup(
+    db: Session,
+    dataset: Dataset,
+    dimension: str,
+    start_date: str,
+    end_date: str,
+) -> Optional[List[Tuple[str, int]]]:
+    """Return (label, count) pairs for an archived dataset, or None if the
+    requested date range can't be answered from the stored rollups."""
+    if dataset.archived_at is None:
+        return None
+
+    # Rollups cover the whole dataset, so the range must include every crime
+    if dataset.first_occ is not None:
+        try:
+            if (
+                date.fromisoformat(start_date) > dataset.first_occ.date()
+                or date.fromisoformat(end_date) < dataset.last_occ.date()
+            ):
+                return None
+        except ValueError:
+            return None
+
+    rows = (
+        db.query(DatasetRollup)
+        .filter(
+            DatasetRollup.dataset == dataset.id,
+            DatasetRollup.dimension == dimension,
+        )
+        .order_by(DatasetRollup.crime_count.desc())
+        .all()
+    )
+    return [(row.label, row.crime_count) for row in rows]
+
+
+def read_crime_batches(db: Session, dataset_id: int) -> Iterator[pl.DataFrame]:
+    # Stream a dataset's crimes through a server-side cursor in batches
+    query = (
+        select(Crime.__table__)
+        .where(Crime.dataset == dataset_id)
+        .execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+    )
+    for rows in db.execute(query).partitions():
+        yield pl.DataFrame(
+            [tuple(row) for row in rows], schema=CRIME_SCHEMA, orient="row"
+        )
+
+
+def write_archive(batches: Iterable[pl.DataFrame], path: Path) -> ArchiveSummary:
+    """Write each batch of crimes as its own row group of a Parquet file, and
+    summarise the crimes on the way through."""
+    row_count = 0
+    occ_range: List[datetime] = []
+
+    with pq.ParquetWriter(path, ARCHIVE_SCHEMA, compression="zstd") as writer:
+
+        def written() -> Iterator[pl.DataFrame]:
+            nonlocal row_count
+            for df in batches:
+                writer.write_table(df.to_arrow())
+                row_count += df.height
+                occ_range.extend(
+                    value
+                    for value in (df["date_time_occ"].min(), df["date_time_occ"].max())
+                    if value is not None
+                )
+                yield df
+
+        rollups = build_rollups(written())
+
+    return ArchiveSummary(
+        row_count=row_count,
+        first_occ=min(occ_range, default=None),
+        last_occ=max(occ_range, default=None),
+        rollups=rollups,
+    )
+
+
+def read_archive(path: Path) -> Iterator[pl.DataFrame]:
+    # Read an archive back one batch at a time, skipping the sampled crimes
+    # that were never removed from the crime table
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=ARCHIVE_BATCH_SIZE):
+        df = pl.from_arrow(batch)
+        if "sample_weight" in df.columns:
+            df = df.filter(pl.col("sample_weight").is_null())
+        yield df
+
+
+def archive_dataset(
+    db: Session,
+    dataset: Dataset,
+    store: ArchiveStore,
+    cutoff: Optional[datetime] = None,
+) -> bool:
+    """Move a dataset's crimes into object storage, keeping its metadata and
+    rollups in the database. Returns False if it was already archived or has
+    been accessed since `cutoff`."""
+    # Lock the dataset row and reload it, the session may hold stale values
+    db.refresh(dataset, with_for_update=True)
+    if dataset.archived_at is not None:
+        db.rollback()
+        return False
+
+    last_used = dataset.last_accessed_at or dataset.created_at
+    if cutoff is not None and last_used is not None and last_used >= cutoff:
+        db.rollback()
+        return False
+
+    start_time = datetime.now()
+    key = f"crime/{dataset.id}.parquet"
+
+    # Upload before deleting anything so a failure never loses data
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "crime.parquet"
+        summary = write_archive(read_crime_batches(db, dataset.id), path)
+        size = path.stat().st_size
+        store.upload(key, path)
+
+    try:
+        insert_rollups(db, dataset.id, summary.rollups)
+
+        # Keep the stratified sample hot so approximate queries still work
+        db.query(Crime).filter(
+            Crime.dataset == dataset.id, Crime.sample_weight.is_(None)
+        ).delete()
+
+        dataset.row_count = summary.row_count
+        dataset.first_occ = summary.first_occ
+        dataset.last_occ = summary.last_occ
+        dataset.archive_path = key
+        dataset.archived_at = datetime.now(timezone.utc)
+        db.commit()
+    except Exception:
+        db.rollback()
+        store.delete(key)
+        raise
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(
+        f"Archived dataset {dataset.id} ({summary.row_count:,} records, "
+        f"{size / 1024:.0f} KiB) in {elapsed:.1f} seconds"
+    )
+    return True
+
+
+def rehydrate_dataset(db: Session, dataset: Dataset, store: ArchiveStore) -> bool:
+    """Load an archived dataset's crimes back into the database. Returns False
+    if another request already rehydrated it."""
+    # Lock and reload the dataset row so concurrent requests don't insert the
+    # rows twice, the session may still hold the values from before the lock
+    db.refresh(dataset, with_for_update=True)
+    if dataset.archived_at is None:
+        db.rollback()
+        return False
+
+    start_time = datetime.now()
+    key = dataset.archive_path
+    restored = 0
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "crime.parquet"
+            store.download(key, path)
+            for batch in read_archive(path):
+                if batch.height:
+                    db.execute(Crime.__table__.insert(), batch.to_dicts())
+                    restored += batch.height
+
+        dataset.archive_path = None
+        dataset.archived_at = None
+        dataset.last_accessed_at = datetime.now(timezone.utc)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # The rows are back, so a leftover archive object is harmless
+    try:
+        store.delete(key)
+    except Exception as e:
+        print(f"Failed to delete archive {key}: {str(e)}")
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(
+        f"Rehydrated dataset {dataset.id} ({restored:,} records) "
+        f"in {elapsed:.1f} seconds"
+    )
+    return True
+
+
+def ensure_hot(db: Session, dataset: Dataset, store: ArchiveStore) -> None:
+    # Bring an archived dataset's crimes back before querying them
+    if dataset.archived_at is not None:
+        rehydrate_dataset(db, dataset, store)
+        db.refresh(dataset)
+
+
+def archive_cold_datasets(
+    db: Session, store: ArchiveStore, days: int = ARCHIVE_AFTER_DAYS
+) -> List[int]:
+    # Archive every dataset that hasn't been accessed within the last `days`
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    cold_datasets = (
+        db.query(Dataset)
+        .filter(
+            Dataset.archived_at.is_(None),
+            func.coalesce(Dataset.last_accessed_at, Dataset.created_at) < cutoff,
+        )
+        .all()
+    )
+
+    archived = []
+    for dataset in cold_datasets:
+        # Datasets opened since the query above are skipped under the lock
+        if archive_dataset(db, dataset, store, cutoff):
+            archived.append(dataset.id)
+    return archived
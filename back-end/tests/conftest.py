@@ -0,0 +1,5 @@
+import os
+
+# database.py requires a connection string at import time. The engine never
+# connects unless a query runs, and these tests only cover pure functions.
+os.environ.setdefault("DB_CONN_STRING_POOL", "postgresql+psycopg2://localhost/test")
@@ -0,0 +1,101 @@
+import polars as pl
+import pytest
+
+from sampling import Z_95, add_sample_weights, combine_estimates, count_variance
+
+
+def areas(**sizes):
+    return pl.DataFrame(
+        {"area_name": [name for name, size in sizes.items() for _ in range(size)]}
+    )
+
+
+def test_sample_weights_sum_to_area_size():
+    df = add_sample_weights(areas(Central=1000, Hollywood=35, Newton=7), per_area=20)
+
+    totals = df.group_by("area_name").agg(pl.col("sample_weight").sum())
+
+    for row in totals.iter_rows(named=True):
+        expected = {"Central": 1000, "Hollywood": 35, "Newton": 7}[row["area_name"]]
+        assert row["sample_weight"] == pytest.approx(expected)
+
+
+def test_sample_size_is_capped_per_area():
+    df = add_sample_weights(areas(Central=1000, Newton=7), per_area=20)
+
+    sampled = (
+        df.filter(pl.col("sample_weight").is_not_null())
+        .group_by("area_name")
+        .len()
+        .sort("area_name")
+    )
+
+    assert sampled["len"].to_list() == [20, 7]
+
+
+def test_small_areas_are_sampled_completely():
+    df = add_sample_weights(areas(Newton=7), per_area=20)
+
+    assert df["sample_weight"].to_list() == [1.0] * 7
+
+
+def test_no_variance_when_the_whole_area_is_sampled():
+    assert count_variance(hits=3, sample_size=7, stratum_size=7) == 0.0
+
+
+def test_variance_of_a_partial_sample():
+    # N^2 * p(1-p)/n * (N-n)/(N-1) with N=100, n=10, p=0.5
+    expected = 100**2 * 0.25 / 10 * 90 / 99
+
+    assert count_variance(hits=5, sample_size=10, stratum_size=100) == pytest.approx(
+        expected
+    )
+
+
+def test_no_variance_without_a_sample():
+    assert count_variance(hits=0, sample_size=0, stratum_size=100) == 0.0
+
+
+def test_combine_estimates_scales_each_area_up():
+    # Central has 100 crimes with 10 sampled, Newton's 5 crimes are all sampled
+    rows = [
+        ("Central", "BURGLARY", 6, 60.0, 4),
+        ("Central", "ASSAULT", 4, 40.0, 1),
+        ("Newton", "BURGLARY", 5, 5.0, 2),
+    ]
+
+    counts, total, total_margin = combine_estimates(rows)
+
+    fpc = 90 / 99
+    assert [label for label, _, _ in counts] == ["BURGLARY", "ASSAULT"]
+    assert counts[0][1] == pytest.approx(100 * 4 / 10 + 2)
+    assert counts[0][2] == pytest.approx(Z_95 * (100**2 * 0.4 * 0.6 / 10 * fpc) ** 0.5)
+    assert counts[1][1] == pytest.approx(100 * 1 / 10)
+    assert counts[1][2] == pytest.approx(Z_95 * (100**2 * 0.1 * 0.9 / 10 * fpc) ** 0.5)
+    assert total == pytest.approx(100 * 5 / 10 + 2)
+    assert total_margin == pytest.approx(Z_95 * (100**2 * 0.25 / 10 * fpc) ** 0.5)
+
+
+def test_combine_estimates_are_exact_for_fully_sampled_areas():
+    rows = [("Newton", "BURGLARY", 3, 3.0, 2), ("Newton", "ASSAULT", 2, 2.0, 1)]
+
+    counts, total, total_margin = combine_estimates(rows)
+
+    assert counts == [("BURGLARY", 2.0, 0.0), ("ASSAULT", 1.0, 0.0)]
+    assert total == 3.0
+    assert total_margin == 0.0
+
+
+def test_combine_estimates_with_no_crimes_in_the_date_range():
+    rows = [("Central", "BURGLARY", 6, 60.0, 0), ("Central", "ASSAULT", 4, 40.0, 0)]
+
+    assert combine_estimates(rows) == ([], 0.0, 0.0)
+
+
+def test_combine_estimates_skips_null_labels():
+    rows = [("Newton", None, 2, 2.0, 2), ("Newton", "ASSAULT", 2, 2.0, 1)]
+
+    counts, total, _ = combine_estimates(rows)
+
+    assert counts == [("ASSAULT", 1.0, 0.0)]
+    assert total == 3.0
@@ -0,0 +1,194 @@
+from datetime import date, datetime, time, timezone
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from model import Dataset
+from storage import (
+    CRIME_SCHEMA,
+    LocalArchiveStore,
+    build_rollups,
+    read_archive,
+    read_rollup,
+    write_archive,
+)
+
+
+def crimes(*rows, location="1ST ST", lat=34.05, lon=-118.25):
+    # rows are (area_name, crime_code_desc, date_time_occ)
+    return pl.DataFrame(
+        [
+            {
+                "area_name": area_name,
+                "crime_code_desc": crime_code_desc,
+                "date_time_occ": date_time_occ,
+                "location": location,
+                "lat": lat,
+                "lon": lon,
+            }
+            for area_name, crime_code_desc, date_time_occ in rows
+        ]
+    )
+
+
+def archived_dataset():
+    return Dataset(
+        id=1,
+        archived_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        first_occ=datetime(2024, 1, 5, 10, 0),
+        last_occ=datetime(2024, 11, 20, 22, 30),
+    )
+
+
+def test_build_rollups_counts_each_dimension():
+    df = crimes(
+        ("Central", "BURGLARY", datetime(2024, 1, 5, 10, 0)),
+        ("Central", "ASSAULT", datetime(2024, 2, 1, 10, 30)),
+        ("Hollywood", "BURGLARY", datetime(2024, 3, 1, 23, 0)),
+    )
+
+    rollups = set(build_rollups([df]))
+
+    assert ("area", "Central", 2) in rollups
+    assert ("area", "Hollywood", 1) in rollups
+    assert ("type", "BURGLARY", 2) in rollups
+    assert ("type", "ASSAULT", 1) in rollups
+    assert ("hour", "10", 2) in rollups
+    assert ("hour", "23", 1) in rollups
+
+
+def test_build_rollups_skips_crimes_without_a_date_and_null_labels():
+    df = crimes(
+        ("Central", "BURGLARY", None),
+        (None, "ASSAULT", datetime(2024, 2, 1, 10, 30)),
+    )
+
+    rollups = build_rollups([df])
+
+    assert ("type", "BURGLARY", 1) not in rollups
+    assert all(label is not None for _, label, _ in rollups)
+    assert ("type", "ASSAULT", 1) in rollups
+
+
+def test_build_rollups_counts_distinct_locations_per_area():
+    df = pl.concat(
+        [
+            crimes(
+                ("Central", "BURGLARY", datetime(2024, 1, 5, 10, 0)),
+                ("Central", "ASSAULT", datetime(2024, 2, 1, 10, 30)),
+            ),
+            crimes(
+                ("Central", "BURGLARY", datetime(2024, 3, 1, 23, 0)),
+                location="2ND ST",
+            ),
+            crimes(("Central", "BURGLARY", None), location="3RD ST", lat=None),
+        ]
+    )
+
+    assert ("locations", "Central", 2) in build_rollups([df])
+
+
+def test_build_rollups_merges_batches():
+    first = crimes(
+        ("Central", "BURGLARY", datetime(2024, 1, 5, 10, 0)),
+        ("Hollywood", "ASSAULT", datetime(2024, 2, 1, 10, 30)),
+    )
+    second = crimes(
+        ("Central", "BURGLARY", datetime(2024, 3, 1, 23, 0)),
+        location="2ND ST",
+    )
+
+    assert sorted(build_rollups([first, second])) == sorted(
+        build_rollups([pl.concat([first, second])])
+    )
+
+
+def test_build_rollups_empty_dataset():
+    assert build_rollups([pl.DataFrame(schema=CRIME_SCHEMA)]) == []
+
+
+def test_read_rollup_ignores_hot_datasets():
+    dataset = archived_dataset()
+    dataset.archived_at = None
+
+    assert read_rollup(None, dataset, "area", "2024-01-01", "2024-12-31") is None
+
+
+def test_read_rollup_rejects_partial_date_ranges():
+    dataset = archived_dataset()
+
+    assert read_rollup(None, dataset, "area", "2024-02-01", "2024-12-31") is None
+    assert read_rollup(None, dataset, "area", "2024-01-01", "2024-11-19") is None
+
+
+def test_read_rollup_rejects_invalid_dates():
+    dataset = archived_dataset()
+
+    assert read_rollup(None, dataset, "area", "not-a-date", "2024-12-31") is None
+
+
+def test_crime_schema_matches_column_types():
+    assert CRIME_SCHEMA["id"] == pl.Int64
+    assert CRIME_SCHEMA["date_rptd"] == pl.Date
+    assert CRIME_SCHEMA["time_occ"] == pl.Time
+    assert CRIME_SCHEMA["date_time_occ"] == pl.Datetime("us")
+    assert CRIME_SCHEMA["created_at"] == pl.Datetime("us", "UTC")
+    assert CRIME_SCHEMA["part_1"] == pl.Boolean
+    assert CRIME_SCHEMA["lat"] == pl.Float64
+
+
+def archive_batch(first_id, sample_weights):
+    # A batch of crimes with every column of the crime table filled in
+    return pl.DataFrame(
+        [
+            {
+                "id": first_id + i,
+                "created_at": datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc),
+                "dataset": 1,
+                "dr_no": f"24010{first_id + i}",
+                "date_rptd": date(2024, 3, 2),
+                "date_time_occ": datetime(2024, 3, 1 + i, 22, 30),
+                "time_occ": time(22, 30),
+                "area_id": 1,
+                "area_name": "Central",
+                "part_1": True,
+                "crime_code_desc": "BURGLARY",
+                "vict_age": None,
+                "location": "1ST ST",
+                "lat": 34.05,
+                "lon": -118.25,
+                "sample_weight": weight,
+            }
+            for i, weight in enumerate(sample_weights)
+        ],
+        schema=CRIME_SCHEMA,
+    )
+
+
+def test_archive_round_trip_through_local_store(tmp_path):
+    batches = [archive_batch(1, [None, 2.0, None]), archive_batch(10, [None, 2.0])]
+    store = LocalArchiveStore(str(tmp_path / "store"))
+
+    summary = write_archive(iter(batches), tmp_path / "written.parquet")
+    assert pq.ParquetFile(tmp_path / "written.parquet").num_row_groups == 2
+    store.upload("crime/1.parquet", tmp_path / "written.parquet")
+    store.download("crime/1.parquet", tmp_path / "downloaded.parquet")
+    restored = pl.concat(list(read_archive(tmp_path / "downloaded.parquet")))
+
+    # Only the crimes deleted at archive time come back
+    expected = pl.concat(batches).filter(pl.col("sample_weight").is_null())
+    assert restored.schema == pl.Schema(CRIME_SCHEMA)
+    assert restored.equals(expected)
+    assert restored["created_at"][0] == datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+    assert summary.row_count == 5
+    assert summary.first_occ == datetime(2024, 3, 1, 22, 30)
+    assert summary.last_occ == datetime(2024, 3, 3, 22, 30)
+    assert ("area", "Central", 5) in summary.rollups
+
+
+def test_archive_without_crimes(tmp_path):
+    summary = write_archive(iter([]), tmp_path / "empty.parquet")
+
+    assert summary == (0, None, None, [])
+    assert list(read_archive(tmp_path / "empty.parquet")) == []
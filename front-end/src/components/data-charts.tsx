@@ -37,37 +37,58 @@ export default function DataCharts({ datasetId }: DataChartsProps) {
   const [areaData, setAreaData] = useState<ChartDataResponse | null>(null);
   const [typeData, setTypeData] = useState<ChartDataResponse | null>(null);
   const [timeData, setTimeData] = useState<ChartDataResponse | null>(null);
+  const [estimated, setEstimated] = useState(false);
 
-  const fetchChartData = async () => {
-    try {
-      setLoading(true);
-      setError(null);
+  useEffect(() => {
+    // Ignore responses for a date range that is no longer selected
+    let current = true;
 
+    const fetchChartData = async (approximate: boolean) => {
       const dateRangeParam = {
         startDate: startDate,
         endDate: endDate,
       };
 
       const [areaResponse, typeResponse, timeResponse] = await Promise.all([
-        apiClient.getCrimesByArea(datasetId, dateRangeParam),
-        apiClient.getCrimesByType(datasetId, dateRangeParam),
-        apiClient.getCrimesByTime(datasetId, dateRangeParam),
+        apiClient.getCrimesByArea(datasetId, dateRangeParam, approximate),
+        apiClient.getCrimesByType(datasetId, dateRangeParam, approximate),
+        apiClient.getCrimesByTime(datasetId, dateRangeParam, approximate),
       ]);
+      if (!current) return false;
 
+      const isEstimate = [areaResponse, typeResponse, timeResponse].some(
+        (response) => response.approximate
+      );
       setAreaData(areaResponse);
       setTypeData(typeResponse);
       setTimeData(timeResponse);
-    } catch (err) {
-      setError(
-        err instanceof Error ? err.message : "Failed to load chart data"
-      );
-    } finally {
+      setEstimated(isEstimate);
       setLoading(false);
-    }
-  };
+      return isEstimate;
+    };
 
-  useEffect(() => {
-    fetchChartData();
+    const loadCharts = async () => {
+      try {
+        setLoading(true);
+        setError(null);
+
+        // Render estimates from the sample right away, then swap in exact numbers
+        if (await fetchChartData(true)) {
+          await fetchChartData(false);
+        }
+      } catch (err) {
+        if (!current) return;
+        setError(
+          err instanceof Error ? err.message : "Failed to load chart data"
+        );
+        setLoading(false);
+      }
+    };
+
+    loadCharts();
+    return () => {
+      current = false;
+    };
   }, [datasetId, startDate, endDate]);
 
   if (error) {
@@ -79,12 +100,24 @@ export default function DataCharts({ datasetId }: DataChartsProps) {
     return data.labels.map((label, index) => ({
       name: label.length > 30 ? label.substring(0, 30) + "..." : label,
       value: data.values[index],
+      margin: data.margins?.[index],
     }));
   };
 
+  // Show the 95% margin of error next to estimated values
+  const formatValue = (value: number, props: any) =>
+    props.payload.margin != null
+      ? `~${value} (±${props.payload.margin})`
+      : value;
+
   return (
     <div className="space-y-6">
-      <div className="flex justify-end gap-2">
+      <div className="flex justify-end items-center gap-4">
+        {estimated && (
+          <span className="text-sm text-muted-foreground">
+            Showing estimates, loading exact numbers...
+          </span>
+        )}
         <div className="flex items-center gap-2">
           <span className="text-sm text-muted-foreground">From:</span>
           <Input
@@ -127,7 +160,12 @@ export default function DataCharts({ datasetId }: DataChartsProps) {
                     interval={0}
                   />
                   <YAxis />
-                  <Tooltip />
+                  <Tooltip
+                    formatter={(value: number, name: string, props: any) => [
+                      formatValue(value, props),
+                      name,
+                    ]}
+                  />
                   <Bar dataKey="value" fill="#2563eb" />
                 </BarChart>
               </ResponsiveContainer>
@@ -168,7 +206,7 @@ export default function DataCharts({ datasetId }: DataChartsProps) {
                       // Show full label in tooltip if it was truncated
                       const fullLabel =
                         typeData?.labels[props.payload.index] || name;
-                      return [value, fullLabel];
+                      return [formatValue(value, props), fullLabel];
                     }}
                   />
                   <Bar dataKey="value" fill="#2563eb" />
@@ -191,7 +229,12 @@ export default function DataCharts({ datasetId }: DataChartsProps) {
                   <CartesianGrid strokeDasharray="3 3" />
                   <XAxis dataKey="name" />
                   <YAxis />
-                  <Tooltip />
+                  <Tooltip
+                    formatter={(value: number, name: string, props: any) => [
+                      formatValue(value, props),
+                      name,
+                    ]}
+                  />
                   <Bar dataKey="value" fill="#2563eb" />
                 </BarChart>
               </ResponsiveContainer>
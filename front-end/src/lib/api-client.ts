@@ -114,11 +114,13 @@ class ApiClient {
 
   async getCrimesByArea(
     datasetId: string,
-    dateRange: ChartDateRange
+    dateRange: ChartDateRange,
+    approximate = false
   ): Promise<ChartDataResponse> {
     const searchParams = new URLSearchParams({
       start_date: dateRange.startDate,
       end_date: dateRange.endDate,
+      ...(approximate && { approximate: "true" }),
     });
     return this.request(
       `/datasets/${datasetId}/charts/crimes-by-area?${searchParams}`
@@ -127,11 +129,13 @@ class ApiClient {
 
   async getCrimesByType(
     datasetId: string,
-    dateRange: ChartDateRange
+    dateRange: ChartDateRange,
+    approximate = false
   ): Promise<ChartDataResponse> {
     const searchParams = new URLSearchParams({
       start_date: dateRange.startDate,
       end_date: dateRange.endDate,
+      ...(approximate && { approximate: "true" }),
     });
     return this.request(
       `/datasets/${datasetId}/charts/crimes-by-type?${searchParams}`
@@ -140,11 +144,13 @@ class ApiClient {
 
   async getCrimesByTime(
     datasetId: string,
-    dateRange: ChartDateRange
+    dateRange: ChartDateRange,
+    approximate = false
   ): Promise<ChartDataResponse> {
     const searchParams = new URLSearchParams({
       start_date: dateRange.startDate,
       end_date: dateRange.endDate,
+      ...(approximate && { approximate: "true" }),
     });
     return this.request(
       `/datasets/${datasetId}/charts/crimes-by-time?${searchParams}`
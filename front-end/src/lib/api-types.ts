@@ -65,6 +65,8 @@ export interface ChartDataResponse {
   labels: string[];
   values: number[];
   total: number;
+  approximate?: boolean;
+  margins?: number[] | null;
 }
 
 export interface ChartDateRange {